@@ -15,6 +15,7 @@ let CONFIG = {
 let ws = null;
 let reconnectAttempts = 0;
 let contentScriptPort = null;
+let pendingFileMessage = null;  // Message waiting for its binary frame
 
 // Load config from storage
 chrome.storage.sync.get(['serverUrl'], (result) => {
@@ -67,6 +68,9 @@ function connect() {
     return;
   }
 
+  ws.binaryType = 'arraybuffer';
+  pendingFileMessage = null;
+
   ws.onopen = () => {
     console.log('[Bridge] Connected!');
     reconnectAttempts = 0;
@@ -77,6 +81,27 @@ function connect() {
   };
 
   ws.onmessage = (event) => {
+    // Binary frame = file contents for the message announced just before it
+    if (event.data instanceof ArrayBuffer) {
+      if (!pendingFileMessage) {
+        console.warn('[Bridge] Unexpected binary frame, dropped');
+        return;
+      }
+      const message = pendingFileMessage;
+      const data = event.data;
+      pendingFileMessage = null;
+      delete message.binary_follows;
+      
+      console.log('[Bridge] Received:', message.type, message.sender || '', `(${data.byteLength} bytes)`);
+      enqueueDelivery(async () => {
+        const fileBytes = message.file_encoding === 'gzip' ? await gunzip(data) : data;
+        delete message.file_encoding;
+        message.file_data = arrayBufferToBase64(fileBytes);
+        handleServerMessage(message);
+      });
+      return;
+    }
+    
     try {
       const message = JSON.parse(event.data);
       
@@ -86,8 +111,13 @@ function connect() {
         return;
       }
       
+      if (message.binary_follows) {
+        pendingFileMessage = message;
+        return;
+      }
+      
       console.log('[Bridge] Received:', message.type, message.sender || '');
-      handleServerMessage(message);
+      enqueueDelivery(() => handleServerMessage(message));
     } catch (err) {
       console.error('[Bridge] Failed to parse message:', err);
     }
@@ -101,6 +131,7 @@ function connect() {
   ws.onclose = (event) => {
     console.log(`[Bridge] Disconnected (code: ${event.code})`);
     ws = null;
+    pendingFileMessage = null;
     updateBadge('disconnected');
     scheduleReconnect();
   };
@@ -132,6 +163,32 @@ function scheduleReconnect() {
 
 // --- Message Handling ---
 
+// Deliver in arrival order, even when a file needs async decompression first
+let deliveryChain = Promise.resolve();
+
+function enqueueDelivery(fn) {
+  deliveryChain = deliveryChain
+    .then(fn)
+    .catch((err) => console.error('[Bridge] Failed to deliver message:', err));
+}
+
+// Server gzips text-like files (file_encoding: 'gzip')
+async function gunzip(buffer) {
+  const stream = new Blob([buffer]).stream().pipeThrough(new DecompressionStream('gzip'));
+  return await new Response(stream).arrayBuffer();
+}
+
+// Ports only carry JSON, so the content script still gets base64
+function arrayBufferToBase64(buffer) {
+  const bytes = new Uint8Array(buffer);
+  const chunkSize = 0x8000;  // Stay under the argument limit of fromCharCode.apply
+  let binary = '';
+  for (let i = 0; i < bytes.length; i += chunkSize) {
+    binary += String.fromCharCode.apply(null, bytes.subarray(i, i + chunkSize));
+  }
+  return btoa(binary);
+}
+
 function handleServerMessage(message) {
   // Forward to content script
   if (contentScriptPort) {
@@ -16,13 +16,36 @@ ALLOWED_CHAT_IDS = []
 # Higher = less API calls, but slower shutdown
 POLL_TIMEOUT = 30
 
+# Optional: webhook mode instead of polling
+# Public HTTPS URL that reaches this server, e.g. a Cloudflare/ngrok tunnel
+# ("https://bridge.example.com"). Leave empty to use long polling.
+TELEGRAM_WEBHOOK_URL = ""
+# Secret path segment for the webhook route (empty = random on each start)
+TELEGRAM_WEBHOOK_SECRET = ""
+
 # Whisper model for voice transcription
 # Options: "tiny", "base", "small", "medium", "large-v2"
 # Larger = more accurate but slower and more RAM
-WHISPER_MODEL_SIZE = "medium"
+# "small" is ~3x faster than "medium" on CPU and plenty for short voice notes
+# English only: "distil-small.en" / "distil-medium.en" are faster still
+# at similar accuracy
+WHISPER_MODEL_SIZE = "small"
 
 # Whisper compute settings
+# "auto": int8_float16 where CTranslate2 supports it (CUDA, some CPUs), else int8
 # For CPU: "int8" (faster) or "float32" (more accurate)  
-# For GPU: "float16"
-WHISPER_COMPUTE_TYPE = "int8"
-WHISPER_DEVICE = "cpu"  # "cpu" or "cuda"
+# For GPU: "int8_float16" (faster) or "float16"
+WHISPER_COMPUTE_TYPE = "auto"
+# Device: "auto" picks CUDA when a GPU is visible to CTranslate2, else CPU.
+# On GPU, "auto" compute type means int8_float16 (INT8 tensor cores on Turing+).
+WHISPER_DEVICE = "auto"  # "auto", "cpu" or "cuda"
+
+# CPU threads for Whisper (0 = all cores but one, leaving one for the server)
+# Oversubscribed int8 inference gets slower, not faster - if transcription is
+# sluggish on a busy machine, try lowering this (even to 1)
+WHISPER_CPU_THREADS = 0
+
+# Batched transcription (faster-whisper>=1.1, 0 = off)
+# Splits each voice note into speech chunks and runs them through the model
+# as one batch. Big win on GPU (try 8-16), little to none on CPU.
+WHISPER_BATCH_SIZE = 0
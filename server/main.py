@@ -2,36 +2,71 @@
 Telegram → Claude Bridge Server
 
 Polls Telegram for updates, forwards to connected Chrome extension via WebSocket.
+File contents travel as a binary frame right after the message's JSON frame.
 Optionally transcribes voice messages using local Whisper.
 
-No public IP needed - works behind NAT, firewalls, whatever.
+No public IP needed - works behind NAT, firewalls, whatever. If you do have a
+public URL (e.g. a Cloudflare/ngrok tunnel), set TELEGRAM_WEBHOOK_URL and
+Telegram will push updates instead of being polled.
 """
 
+import io
 import os
-import json
-import base64
+import gzip
+import math
+import time
+import queue
+import atexit
+import secrets
 import asyncio
+import logging
 from typing import Optional
+from logging.handlers import QueueHandler, QueueListener
+from collections import OrderedDict, deque
 from contextlib import asynccontextmanager
 
 import httpx
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import orjson
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 
 
+# --- Logging ---
+
+# Handlers only enqueue; a listener thread does the actual writes, so a slow
+# terminal never blocks the event loop
+logger = logging.getLogger("bridge")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+_log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(_log_queue))
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+_log_listener = QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+
 # --- Configuration (config.py > environment variables > defaults) ---
 
+# Defaults first, so a config.py from an older version still works
+TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
+ALLOWED_CHAT_IDS = []
+POLL_TIMEOUT = 30
+TELEGRAM_WEBHOOK_URL = ""
+TELEGRAM_WEBHOOK_SECRET = ""
+WHISPER_MODEL_SIZE = "small"
+WHISPER_COMPUTE_TYPE = "auto"
+WHISPER_DEVICE = "auto"
+WHISPER_CPU_THREADS = 0  # 0 = all cores but one
+WHISPER_BATCH_SIZE = 0  # 0 = unbatched
+
 try:
     from config import *
-    print("Loaded config from config.py")
+    logger.info("Loaded config from config.py")
 except ImportError:
-    print("No config.py found, using environment variables")
-    TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
-    ALLOWED_CHAT_IDS = []
-    POLL_TIMEOUT = 30
-    WHISPER_MODEL_SIZE = "medium"
-    WHISPER_COMPUTE_TYPE = "int8"
-    WHISPER_DEVICE = "cpu"
+    logger.info("No config.py found, using environment variables")
 
 # Allow env vars to override config file
 if os.environ.get("TELEGRAM_BOT_TOKEN"):
@@ -40,6 +75,15 @@ if os.environ.get("TELEGRAM_BOT_TOKEN"):
 if os.environ.get("ALLOWED_CHAT_IDS"):
     ALLOWED_CHAT_IDS = [int(x.strip()) for x in os.environ["ALLOWED_CHAT_IDS"].split(",") if x.strip()]
 
+if os.environ.get("WHISPER_MODEL_SIZE"):
+    WHISPER_MODEL_SIZE = os.environ["WHISPER_MODEL_SIZE"]
+
+if os.environ.get("TELEGRAM_WEBHOOK_URL"):
+    TELEGRAM_WEBHOOK_URL = os.environ["TELEGRAM_WEBHOOK_URL"]
+
+# Random per run unless pinned - setWebhook is called on every startup anyway
+WEBHOOK_SECRET = TELEGRAM_WEBHOOK_SECRET or secrets.token_urlsafe(32)
+
 # Convert to set for fast lookup
 ALLOWED_CHATS = set(ALLOWED_CHAT_IDS) if ALLOWED_CHAT_IDS else set()
 
@@ -48,23 +92,125 @@ TELEGRAM_API = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
 
 # --- Optional: Whisper for voice transcription ---
 
+WHISPER_SAMPLE_RATE = 16000  # Whisper wants 16 kHz mono float32
+MIN_VOICE_SECONDS = 0.5  # Shorter clips are accidental taps, not worth a 30s encoder pass
+
+
+def _auto_device() -> str:
+    """CUDA if CTranslate2 can see a GPU, otherwise CPU."""
+    import ctranslate2
+    return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
+
+def _auto_compute_type(device: str) -> str:
+    """Pick the fastest int8 mode CTranslate2 has kernels for on this device.
+    
+    int8_float16 keeps int8 weights/GEMMs but runs the rest in fp16, saving
+    quantize/dequantize work. CUDA (Turing+) supports it; most CPUs don't,
+    and CTranslate2 would silently convert it anyway, so they get plain int8.
+    """
+    import ctranslate2
+    if "int8_float16" in ctranslate2.get_supported_compute_types(device):
+        return "int8_float16"
+    return "int8"
+
+
 try:
-    from faster_whisper import WhisperModel
-    WHISPER_MODEL = WhisperModel(
-        WHISPER_MODEL_SIZE, 
-        device=WHISPER_DEVICE, 
-        compute_type=WHISPER_COMPUTE_TYPE
-    )
+    import numpy as np
+    from faster_whisper import WhisperModel, decode_audio
     WHISPER_AVAILABLE = True
-    print(f"faster-whisper loaded ({WHISPER_MODEL_SIZE}, {WHISPER_COMPUTE_TYPE}, {WHISPER_DEVICE})")
 except ImportError:
-    WHISPER_MODEL = None
-    WHISPER_AVAILABLE = False
-except Exception as e:
-    print(f"Whisper init failed: {e}")
-    WHISPER_MODEL = None
     WHISPER_AVAILABLE = False
 
+# Loaded on the first voice message, see get_whisper_model()
+WHISPER_MODEL = None
+_whisper_lock = asyncio.Lock()
+
+
+def _build_whisper_model(device: str):
+    compute_type = WHISPER_COMPUTE_TYPE
+    if compute_type == "auto":
+        compute_type = _auto_compute_type(device)
+    # Pin threads explicitly: CTranslate2's default competes with the event
+    # loop, and oversubscribed int8 kernels get slower, not faster
+    cpu_threads = WHISPER_CPU_THREADS or max(1, (os.cpu_count() or 2) - 1)
+    model = WhisperModel(
+        WHISPER_MODEL_SIZE, 
+        device=device, 
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=1,
+    )
+    
+    if device == "cuda":
+        # cuBLAS is only loaded on first use - run one tiny transcription so
+        # a missing library raises here instead of on every voice note.
+        # (A missing cuDNN usually aborts inside CTranslate2 rather than
+        # raising, which no fallback can catch.)
+        segments, _ = model.transcribe(
+            np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32),
+            language="en",
+            beam_size=1,
+        )
+        list(segments)
+    
+    logger.info("faster-whisper loaded (%s, %s, %s)", WHISPER_MODEL_SIZE, compute_type, device)
+    return model
+
+
+def _load_whisper_model():
+    if WHISPER_DEVICE != "auto":
+        # Explicitly configured device - no fallback
+        model = _build_whisper_model(WHISPER_DEVICE)
+    else:
+        device = _auto_device()
+        try:
+            model = _build_whisper_model(device)
+        except Exception as e:
+            if device == "cpu":
+                raise
+            # A visible GPU doesn't mean cuBLAS is installed
+            logger.warning("Whisper on %s failed (%s), falling back to cpu", device, e)
+            model = _build_whisper_model("cpu")
+    
+    if WHISPER_BATCH_SIZE > 1:
+        try:
+            from faster_whisper import BatchedInferencePipeline
+        except ImportError:
+            logger.warning("Batched Whisper needs faster-whisper>=1.1, transcribing unbatched")
+        else:
+            return BatchedInferencePipeline(model=model)
+    return model
+
+
+async def get_whisper_model():
+    """Load Whisper on first use. Keeps startup fast and text-only setups small.
+    
+    Returns None (and marks Whisper unavailable) if the model fails to load.
+    """
+    global WHISPER_MODEL, WHISPER_AVAILABLE
+    
+    async with _whisper_lock:
+        if WHISPER_MODEL is None and WHISPER_AVAILABLE:
+            try:
+                WHISPER_MODEL = await asyncio.to_thread(_load_whisper_model)
+            except Exception as e:
+                logger.error("Whisper init failed: %s", e)
+                WHISPER_AVAILABLE = False
+    
+    return WHISPER_MODEL
+
+
+# Optional: decode voice notes with libsndfile (faster than faster-whisper's
+# PyAV decoder for short OGG/Opus clips)
+try:
+    import numpy as np
+    import soundfile as sf
+    from scipy.signal import resample_poly
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
 
 # --- State ---
 
@@ -72,80 +218,210 @@ class ConnectionManager:
     """Manages WebSocket connections to Chrome extension(s)."""
     
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: set[WebSocket] = set()
+        # Keeps a JSON frame and its binary frame together when broadcasts overlap
+        self._send_lock = asyncio.Lock()
     
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"Extension connected. Total: {len(self.active_connections)}")
+        self.active_connections.add(websocket)
+        logger.info("Extension connected. Total: %d", len(self.active_connections))
     
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        print(f"Extension disconnected. Total: {len(self.active_connections)}")
+        self.active_connections.discard(websocket)
+        logger.info("Extension disconnected. Total: %d", len(self.active_connections))
     
     async def broadcast(self, message: dict):
         """Send to all connected extensions."""
+        await self._broadcast(message, None)
+    
+    async def broadcast_with_binary(self, message: dict, data: bytes):
+        """Send message JSON followed by a binary frame with the file contents."""
+        message["binary_follows"] = True
+        await self._broadcast(message, data)
+    
+    async def _broadcast(self, message: dict, data: Optional[bytes]):
         if not self.active_connections:
-            print("Warning: No extensions connected, message dropped")
+            logger.warning("No extensions connected, message dropped")
             return
-            
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                print(f"Failed to send to extension: {e}")
-                disconnected.append(connection)
         
-        for conn in disconnected:
-            if conn in self.active_connections:
-                self.active_connections.remove(conn)
+        # Serialize once, not per connection. Sent as a text frame - binary
+        # frames are reserved for file data.
+        text = orjson.dumps(message).decode()
+        
+        async with self._send_lock:
+            # Send to all extensions in parallel. Snapshot, since connections
+            # can disconnect while we wait.
+            connections = list(self.active_connections)
+            results = await asyncio.gather(
+                *(self._send(conn, text, data) for conn in connections),
+                return_exceptions=True,
+            )
+            
+            for conn, result in zip(connections, results):
+                if isinstance(result, Exception):
+                    logger.warning("Failed to send to extension: %s", result)
+                    self.active_connections.discard(conn)
+    
+    @staticmethod
+    async def _send(connection: WebSocket, text: str, data: Optional[bytes]):
+        await connection.send_text(text)
+        if data is not None:
+            await connection.send_bytes(data)
 
 
 manager = ConnectionManager()
 
+# Shared Telegram client, created in lifespan
+http_client: Optional[httpx.AsyncClient] = None
+
+# "polling" or "webhook", reported by /health
+telegram_mode = "polling"
+
+# Keep references to fire-and-forget tasks so they aren't garbage collected
+background_tasks = set()
+
+# Updates are processed concurrently; Whisper is CPU-heavy, so bound how many
+# transcriptions run at once
+MAX_CONCURRENT_TRANSCRIPTIONS = 4
+transcribe_semaphore = asyncio.Semaphore(MAX_CONCURRENT_TRANSCRIPTIONS)
+
 
 # --- Telegram helpers ---
 
+# getFile results, keyed by file_id. Telegram keeps file paths valid for ~1h,
+# so entries expire a bit earlier than that.
+FILE_PATH_CACHE_SIZE = 1024
+FILE_PATH_CACHE_TTL = 3300  # seconds
+
+_file_path_cache = OrderedDict()  # file_id -> (expires_at, file_path)
+_file_path_locks = {}  # file_id -> asyncio.Lock
+
+
+def _cached_file_path(file_id: str) -> Optional[str]:
+    entry = _file_path_cache.get(file_id)
+    if entry is None:
+        return None
+    expires_at, file_path = entry
+    if expires_at < time.monotonic():
+        del _file_path_cache[file_id]
+        return None
+    _file_path_cache.move_to_end(file_id)
+    return file_path
+
+
 async def get_file_url(file_id: str, client: httpx.AsyncClient) -> Optional[str]:
-    """Get download URL for a Telegram file."""
-    resp = await client.get(f"{TELEGRAM_API}/getFile", params={"file_id": file_id})
-    data = resp.json()
-    if data.get("ok"):
-        file_path = data["result"]["file_path"]
-        return f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}"
-    return None
+    """Get download URL for a Telegram file. Cached per file_id."""
+    file_path = _cached_file_path(file_id)
+    
+    if file_path is None:
+        # Single-flight: concurrent lookups for the same file_id share one request
+        lock = _file_path_locks.setdefault(file_id, asyncio.Lock())
+        try:
+            async with lock:
+                file_path = _cached_file_path(file_id)
+                if file_path is None:
+                    resp = await client.get(f"{TELEGRAM_API}/getFile", params={"file_id": file_id})
+                    data = orjson.loads(resp.content)
+                    if not data.get("ok"):
+                        return None
+                    file_path = data["result"]["file_path"]
+                    _file_path_cache[file_id] = (time.monotonic() + FILE_PATH_CACHE_TTL, file_path)
+                    if len(_file_path_cache) > FILE_PATH_CACHE_SIZE:
+                        _file_path_cache.popitem(last=False)
+        finally:
+            if not lock.locked() and _file_path_locks.get(file_id) is lock:
+                del _file_path_locks[file_id]
+    
+    return f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}"
+
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
 
-async def download_file(url: str, client: httpx.AsyncClient) -> bytes:
+async def download_file(url: str, client: httpx.AsyncClient) -> bytearray:
     """Download file content from Telegram."""
-    resp = await client.get(url)
-    return resp.content
+    # Stream into one buffer instead of letting httpx keep every chunk and
+    # then join them - the bytearray goes straight out as the binary frame
+    buf = bytearray()
+    async with client.stream("GET", url) as resp:
+        async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            buf += chunk
+    return buf
+
+
+async def fetch_telegram_file(file_id: str, client: httpx.AsyncClient) -> Optional[bytearray]:
+    """Resolve and download a Telegram file. None if Telegram can't find it."""
+    file_url = await get_file_url(file_id, client)
+    if not file_url:
+        return None
+    return await download_file(file_url, client)
+
+
+def load_pcm(audio_data: bytes):
+    """Decode audio bytes to 16 kHz mono float32 PCM for Whisper."""
+    if SOUNDFILE_AVAILABLE:
+        try:
+            pcm, sample_rate = sf.read(io.BytesIO(audio_data), dtype="float32", always_2d=False)
+            if pcm.ndim > 1:
+                pcm = pcm.mean(axis=1)
+            if sample_rate != WHISPER_SAMPLE_RATE:
+                g = math.gcd(sample_rate, WHISPER_SAMPLE_RATE)
+                pcm = resample_poly(pcm, WHISPER_SAMPLE_RATE // g, sample_rate // g)
+            return pcm.astype(np.float32, copy=False)
+        except Exception as e:
+            # Old libsndfile builds can't read Opus - let PyAV handle it
+            logger.warning("soundfile decode failed, falling back to PyAV: %s", e)
+    
+    return decode_audio(io.BytesIO(audio_data), sampling_rate=WHISPER_SAMPLE_RATE)
+
+
+def _run_whisper(model, pcm):
+    """Transcribe synchronously. Called from a worker thread."""
+    options = dict(
+        # Trim silence before the encoder sees it
+        vad_filter=True,
+        vad_parameters=dict(min_silence_duration_ms=500),
+        # Voice notes are short - greedy decoding is as good as beam search here
+        beam_size=1,
+        condition_on_previous_text=False,
+    )
+    if not isinstance(model, WhisperModel):
+        # BatchedInferencePipeline: speech chunks go through the encoder together
+        options["batch_size"] = WHISPER_BATCH_SIZE
+    segments, info = model.transcribe(pcm, **options)
+    # segments is lazy - the model actually runs while we iterate, so do it here
+    text = " ".join(segment.text.strip() for segment in segments)
+    return text, info
 
 
-async def transcribe_voice(audio_data: bytes, file_ext: str = "ogg") -> str:
-    """Transcribe audio using faster-whisper. Falls back to [voice message] if unavailable."""
-    if not WHISPER_AVAILABLE:
-        return "[Voice message - Whisper not installed]"
+async def transcribe_voice(audio_data: bytes) -> Optional[str]:
+    """Transcribe audio using faster-whisper.
     
-    # Write temp file (Whisper needs file path)
-    import tempfile
-    with tempfile.NamedTemporaryFile(suffix=f".{file_ext}", delete=False) as f:
-        f.write(audio_data)
-        temp_path = f.name
+    Returns None if Whisper isn't installed or the model can't be loaded,
+    so the caller can forward the audio itself instead.
+    """
+    if not WHISPER_AVAILABLE:
+        return None
     
     try:
-        # faster-whisper returns segments iterator
-        segments, info = WHISPER_MODEL.transcribe(temp_path)
-        text = " ".join(segment.text.strip() for segment in segments)
-        print(f"Transcribed {info.duration:.1f}s audio (language: {info.language})")
+        # Off the event loop, so pings and other messages keep flowing
+        pcm = await asyncio.to_thread(load_pcm, audio_data)
+        
+        # Whisper pads everything to 30s, so a tap costs as much as a full clip
+        if len(pcm) < MIN_VOICE_SECONDS * WHISPER_SAMPLE_RATE:
+            return "[Empty voice note]"
+        
+        model = await get_whisper_model()
+        if model is None:
+            return None
+        
+        text, info = await asyncio.to_thread(_run_whisper, model, pcm)
+        logger.info("Transcribed %.1fs audio (language: %s)", info.duration, info.language)
         return text.strip() or "[Empty transcription]"
     except Exception as e:
-        print(f"Transcription error: {e}")
+        logger.error("Transcription error: %s", e)
         return f"[Transcription failed: {e}]"
-    finally:
-        os.unlink(temp_path)
 
 
 def get_sender_name(message: dict) -> str:
@@ -162,18 +438,72 @@ def get_sender_name(message: dict) -> str:
 
 # --- Message Processing ---
 
+# File types worth compressing before they go over the WebSocket. Images,
+# audio and zip-based office formats are already compressed.
+COMPRESSIBLE_MIME_TYPES = {
+    "application/pdf",
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "application/x-yaml",
+    "image/svg+xml",
+}
+COMPRESS_MIN_SIZE = 1024  # bytes
+COMPRESS_LEVEL = 3  # gzip - cheap, and most of the gain for text
+
+
+async def compress_file_data(payload: dict, file_data: bytes) -> bytes:
+    """gzip compressible file types, marking the payload with file_encoding."""
+    mime_type = payload.get("mime_type", "")
+    if len(file_data) < COMPRESS_MIN_SIZE:
+        return file_data
+    if not (mime_type.startswith("text/") or mime_type in COMPRESSIBLE_MIME_TYPES):
+        return file_data
+    
+    compressed = await asyncio.to_thread(gzip.compress, file_data, COMPRESS_LEVEL)
+    if len(compressed) >= len(file_data):
+        return file_data
+    
+    payload["file_encoding"] = "gzip"
+    return compressed
+
+
+# Recently seen update_ids - Telegram redelivers on webhook retries
+RECENT_UPDATES_SIZE = 256
+_recent_update_ids = deque(maxlen=RECENT_UPDATES_SIZE)
+
+
+def accept_update(update: dict) -> Optional[dict]:
+    """Return the update's message if it should be processed, otherwise None.
+    
+    Only cheap checks, so duplicates and ignored chats never cost a
+    download or a transcription.
+    """
+    update_id = update.get("update_id")
+    if update_id in _recent_update_ids:
+        return None
+    _recent_update_ids.append(update_id)
+    
+    message = update.get("message")
+    if not message:
+        return None
+    
+    # Filter by allowed chat IDs if configured
+    chat_id = message.get("chat", {}).get("id")
+    if ALLOWED_CHATS and chat_id not in ALLOWED_CHATS:
+        logger.info("Ignoring message from chat %s (not in allowed list)", chat_id)
+        return None
+    
+    return message
+
+
 async def process_telegram_message(message: dict, client: httpx.AsyncClient):
     """Process a single Telegram message and broadcast to extensions."""
     
     sender = get_sender_name(message)
     chat_id = message.get("chat", {}).get("id")
     
-    # Filter by allowed chat IDs if configured
-    if ALLOWED_CHATS and chat_id not in ALLOWED_CHATS:
-        print(f"Ignoring message from chat {chat_id} (not in allowed list)")
-        return
-    
-    print(f"Processing message from {sender} in chat {chat_id}")
+    logger.info("Processing message from %s in chat %s", sender, chat_id)
     
     # Build payload for extension
     payload = {
@@ -183,46 +513,51 @@ async def process_telegram_message(message: dict, client: httpx.AsyncClient):
         "message_id": message.get("message_id"),
         "timestamp": message.get("date"),
     }
+    file_data = None  # Sent as a binary frame after the payload
     
     # Handle different message types
     
     if "text" in message:
         payload["content_type"] = "text"
         payload["text"] = message["text"]
-        print(f"  Text: {message['text'][:50]}...")
+        logger.info("  Text: %.50s...", message["text"])
     
     elif "voice" in message:
         # Voice message - download and transcribe
         voice = message["voice"]
-        file_url = await get_file_url(voice["file_id"], client)
-        if file_url:
-            print(f"  Voice message, downloading...")
-            audio_data = await download_file(file_url, client)
-            
-            # Transcribe or send as audio
+        logger.info("  Voice message, downloading...")
+        file_data = await fetch_telegram_file(voice["file_id"], client)
+        if file_data is not None:
+            # Transcribe, or send as audio if Whisper isn't usable (not
+            # installed, or the model failed to load for this very note)
+            transcription = None
             if WHISPER_AVAILABLE:
-                print(f"  Transcribing...")
-                transcription = await transcribe_voice(audio_data, "ogg")
+                logger.info("  Transcribing...")
+                async with transcribe_semaphore:
+                    transcription = await transcribe_voice(file_data)
+            
+            if transcription is not None:
                 payload["content_type"] = "voice_transcribed"
                 payload["text"] = transcription
-                print(f"  Transcription: {transcription[:50]}...")
+                file_data = None
+                logger.info("  Transcription: %.50s...", transcription)
             else:
                 payload["content_type"] = "voice_audio"
-                payload["file_data"] = base64.b64encode(audio_data).decode()
                 payload["file_name"] = f"voice_{message['message_id']}.ogg"
                 payload["mime_type"] = "audio/ogg"
     
     elif "audio" in message:
         # Audio file (mp3, etc) - different from voice notes
         audio = message["audio"]
-        file_url = await get_file_url(audio["file_id"], client)
-        if file_url:
-            title = audio.get("title", "audio")
-            performer = audio.get("performer", "")
-            print(f"  Audio: {performer} - {title}" if performer else f"  Audio: {title}")
-            file_data = await download_file(file_url, client)
+        title = audio.get("title", "audio")
+        performer = audio.get("performer", "")
+        if performer:
+            logger.info("  Audio: %s - %s", performer, title)
+        else:
+            logger.info("  Audio: %s", title)
+        file_data = await fetch_telegram_file(audio["file_id"], client)
+        if file_data is not None:
             payload["content_type"] = "file"
-            payload["file_data"] = base64.b64encode(file_data).decode()
             # Use title/performer for filename if available
             ext = audio.get("mime_type", "audio/mpeg").split("/")[-1]
             if performer and title:
@@ -234,24 +569,20 @@ async def process_telegram_message(message: dict, client: httpx.AsyncClient):
     elif "document" in message:
         # File attachment
         doc = message["document"]
-        file_url = await get_file_url(doc["file_id"], client)
-        if file_url:
-            print(f"  Document: {doc.get('file_name', 'unknown')}")
-            file_data = await download_file(file_url, client)
+        logger.info("  Document: %s", doc.get("file_name", "unknown"))
+        file_data = await fetch_telegram_file(doc["file_id"], client)
+        if file_data is not None:
             payload["content_type"] = "file"
-            payload["file_data"] = base64.b64encode(file_data).decode()
             payload["file_name"] = doc.get("file_name", f"file_{message['message_id']}")
             payload["mime_type"] = doc.get("mime_type", "application/octet-stream")
     
     elif "photo" in message:
         # Photo - get largest size
         photo = message["photo"][-1]  # Last element is largest
-        file_url = await get_file_url(photo["file_id"], client)
-        if file_url:
-            print(f"  Photo")
-            file_data = await download_file(file_url, client)
+        logger.info("  Photo")
+        file_data = await fetch_telegram_file(photo["file_id"], client)
+        if file_data is not None:
             payload["content_type"] = "image"
-            payload["file_data"] = base64.b64encode(file_data).decode()
             payload["file_name"] = f"photo_{message['message_id']}.jpg"
             payload["mime_type"] = "image/jpeg"
     
@@ -259,91 +590,161 @@ async def process_telegram_message(message: dict, client: httpx.AsyncClient):
         # Unsupported message type
         payload["content_type"] = "unsupported"
         payload["text"] = "[Unsupported message type]"
-        print(f"  Unsupported message type")
+        logger.info("  Unsupported message type")
     
     # Include caption if present (for photos/docs with captions)
     if "caption" in message:
         payload["caption"] = message["caption"]
-        print(f"  Caption: {message['caption'][:50]}...")
+        logger.info("  Caption: %.50s...", message["caption"])
     
     # Broadcast to all connected extensions
-    await manager.broadcast(payload)
+    if file_data is not None:
+        file_data = await compress_file_data(payload, file_data)
+        await manager.broadcast_with_binary(payload, file_data)
+    else:
+        await manager.broadcast(payload)
 
 
 # --- Telegram Polling ---
 
-async def poll_telegram():
+async def poll_telegram(client: httpx.AsyncClient):
     """Long-poll Telegram for updates. Runs forever."""
     
     if not TELEGRAM_BOT_TOKEN:
-        print("ERROR: TELEGRAM_BOT_TOKEN not set! Polling disabled.")
+        logger.error("TELEGRAM_BOT_TOKEN not set! Polling disabled.")
         return
     
     offset = 0  # Track which updates we've seen
     
-    print(f"Starting Telegram polling (timeout={POLL_TIMEOUT}s)...")
+    # getUpdates is refused while a webhook is registered (e.g. from a previous run)
+    try:
+        await client.post(f"{TELEGRAM_API}/deleteWebhook")
+    except httpx.HTTPError as e:
+        logger.warning("deleteWebhook failed: %s", e)
     
-    async with httpx.AsyncClient(timeout=POLL_TIMEOUT + 10) as client:
-        while True:
-            try:
-                # Long poll - Telegram holds connection until message arrives or timeout
-                resp = await client.get(
-                    f"{TELEGRAM_API}/getUpdates",
-                    params={
-                        "offset": offset,
-                        "timeout": POLL_TIMEOUT,
-                        "allowed_updates": ["message"],  # Only messages, not edits/reactions/etc
-                    }
-                )
-                
-                data = resp.json()
-                
-                if not data.get("ok"):
-                    print(f"Telegram API error: {data}")
-                    await asyncio.sleep(5)
-                    continue
-                
-                updates = data.get("result", [])
-                
-                for update in updates:
-                    # Move offset past this update so we don't see it again
-                    offset = update["update_id"] + 1
-                    
-                    # Process the message
-                    message = update.get("message")
-                    if message:
-                        await process_telegram_message(message, client)
-                
-            except httpx.TimeoutException:
-                # Normal - long poll timed out with no messages
-                pass
-            except Exception as e:
-                print(f"Polling error: {e}")
+    logger.info("Starting Telegram polling (timeout=%ds)...", POLL_TIMEOUT)
+    
+    while True:
+        try:
+            # Long poll - Telegram holds connection until message arrives or timeout
+            resp = await client.get(
+                f"{TELEGRAM_API}/getUpdates",
+                params={
+                    "offset": offset,
+                    "timeout": POLL_TIMEOUT,
+                    "allowed_updates": ["message"],  # Only messages, not edits/reactions/etc
+                }
+            )
+            
+            data = orjson.loads(resp.content)
+            
+            if not data.get("ok"):
+                logger.error("Telegram API error: %s", data)
                 await asyncio.sleep(5)
+                continue
+            
+            updates = data.get("result", [])
+            
+            tasks = []
+            for update in updates:
+                # Move offset past this update so we don't see it again
+                offset = update["update_id"] + 1
+                
+                # Process messages concurrently so a slow download or
+                # transcription doesn't hold up the rest of the batch
+                message = accept_update(update)
+                if message:
+                    tasks.append(asyncio.create_task(process_telegram_message(message, client)))
+            
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error("Message processing error: %s", result)
+            
+        except httpx.TimeoutException:
+            # Normal - long poll timed out with no messages
+            pass
+        except Exception as e:
+            logger.error("Polling error: %s", e)
+            await asyncio.sleep(5)
+
+
+# --- Telegram Webhook ---
+
+async def set_webhook(client: httpx.AsyncClient) -> bool:
+    """Register our webhook route with Telegram. Returns False if that failed."""
+    url = f"{TELEGRAM_WEBHOOK_URL.rstrip('/')}/telegram-webhook/{WEBHOOK_SECRET}"
+    try:
+        resp = await client.post(
+            f"{TELEGRAM_API}/setWebhook",
+            json={"url": url, "allowed_updates": ["message"]},
+        )
+        data = orjson.loads(resp.content)
+    except httpx.HTTPError as e:
+        logger.error("setWebhook failed: %s", e)
+        return False
+    
+    if not data.get("ok"):
+        logger.error("setWebhook failed: %s", data)
+        return False
+    
+    logger.info("Telegram webhook set to %s", TELEGRAM_WEBHOOK_URL)
+    return True
+
+
+def _log_task_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error("Message processing error: %s", task.exception())
 
 
 # --- FastAPI app ---
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Bridge server starting...")
-    print(f"Whisper available: {WHISPER_AVAILABLE}")
+    logger.info("Bridge server starting...")
+    logger.info("Whisper available: %s", WHISPER_AVAILABLE)
+    
+    global http_client, telegram_mode
     
     if not TELEGRAM_BOT_TOKEN:
-        print("WARNING: TELEGRAM_BOT_TOKEN not set!")
+        logger.warning("TELEGRAM_BOT_TOKEN not set!")
     
-    # Start polling in background
-    polling_task = asyncio.create_task(poll_telegram())
+    # HTTP/2 multiplexes getFile calls and downloads over one TLS session
+    # to api.telegram.org instead of a handshake per parallel request
+    http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=POLL_TIMEOUT + 10,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_keepalive_connections=20,
+            max_connections=40,
+            keepalive_expiry=60,
+        ),
+    )
+    
+    # Webhook if configured, otherwise (or if Telegram rejects it) fall back to polling
+    polling_task = None
+    if TELEGRAM_BOT_TOKEN and TELEGRAM_WEBHOOK_URL and await set_webhook(http_client):
+        telegram_mode = "webhook"
+    else:
+        telegram_mode = "polling"
+        polling_task = asyncio.create_task(poll_telegram(http_client))
     
     yield
     
     # Cleanup
-    polling_task.cancel()
-    try:
-        await polling_task
-    except asyncio.CancelledError:
-        pass
-    print("Bridge server shutting down...")
+    if polling_task:
+        polling_task.cancel()
+        try:
+            await polling_task
+        except asyncio.CancelledError:
+            pass
+    # Webhook updates still in flight would otherwise hit a closed client
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await http_client.aclose()
+    logger.info("Bridge server shutting down...")
 
 
 app = FastAPI(title="Telegram-Claude Bridge", lifespan=lifespan)
@@ -363,10 +764,27 @@ async def health():
         "status": "ok",
         "connections": len(manager.active_connections),
         "whisper": WHISPER_AVAILABLE,
-        "mode": "polling"
+        "mode": telegram_mode
     }
 
 
+@app.post("/telegram-webhook/{secret}")
+async def telegram_webhook(secret: str, update: dict):
+    """Telegram pushes updates here when webhook mode is enabled."""
+    if not secrets.compare_digest(secret, WEBHOOK_SECRET):
+        raise HTTPException(status_code=403)
+    
+    # Answer Telegram right away; processing (downloads, Whisper) runs in the background
+    message = accept_update(update)
+    if message:
+        task = asyncio.create_task(process_telegram_message(message, http_client))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+        task.add_done_callback(_log_task_error)
+    
+    return {"ok": True}
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for Chrome extension."""
@@ -377,7 +795,7 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             try:
                 await asyncio.sleep(20)  # Ping every 20 seconds
-                await websocket.send_json({"type": "ping", "ts": asyncio.get_event_loop().time()})
+                await websocket.send_text(orjson.dumps({"type": "ping", "ts": asyncio.get_event_loop().time()}).decode())
             except Exception:
                 break
     
@@ -386,13 +804,13 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         while True:
             data = await websocket.receive_text()
-            msg = json.loads(data)
+            msg = orjson.loads(data)
             
             if msg.get("type") == "pong":
                 # Keepalive response, ignore
                 pass
             elif msg.get("type") == "status":
-                print(f"Extension status: {msg.get('status')}")
+                logger.info("Extension status: %s", msg.get("status"))
                 
     except WebSocketDisconnect:
         ping_task.cancel()
@@ -401,4 +819,6 @@ async def websocket_endpoint(websocket: WebSocket):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8765)
+    # Compression is chosen per file type in compress_file_data - blanket
+    # permessage-deflate would just burn CPU on JPEGs and voice notes
+    uvicorn.run(app, host="0.0.0.0", port=8765, ws_per_message_deflate=False)